@@ -9,79 +9,99 @@ FPS = 60
 SCREEN_WIDTH = 550
 SCREEN_HEIGHT = 500
 ANIMATION_SPEED = 0.1
+FRAME_MSEC = 1000.0 / FPS  # duration of a single frame in milliseconds
+_BG_POSITIONS = ((0, 0), (SCREEN_WIDTH // 2, 0))  # the background is drawn twice
 
+# the climb curve 1 - cos(frac * pi) sampled at _CLIMB_STEPS + 1 points of frac
+_CLIMB_STEPS = 256
+_CLIMB_LUT = [1 - math.cos(k / _CLIMB_STEPS * math.pi) for k in range(_CLIMB_STEPS + 1)]
 
-class Bird(pygame.sprite.Sprite):
+# decoded surfaces, keyed by image name, filled lazily by load_image()
+_image_cache = {}
+# collision bitmasks of those surfaces, same keys, filled lazily by load_mask()
+_mask_cache = {}
+# images without transparency, these are converted without an alpha channel
+_opaque_images = ('background',)
+# finished (top image, top mask, bottom image, bottom mask) of a PipePair,
+# keyed by its (pipe_tp, pipe_bl) pieces
+_pipe_cache = {}
+
+
+class Bird(object):
     WIDTH = HEIGHT = 32
     SINK_SPEED = 0.12
     CLIMB_SPEED = 0.19
     CLIMB_DURATION = 400
 
-    def __init__(self, free_fall_time, images):
+    # no sprite groups are used, so a plain slotted object is enough
+    __slots__ = ('x', 'y', 'free_fall_time', 'rect', 'image', 'mask',
+                 '_wings', '_wing_masks')
 
-        super(Bird, self).__init__()
+    def __init__(self, free_fall_time, images, masks):
 
         # set bird attributes
         self.x, self.y = int(SCREEN_WIDTH * 0.15), int(SCREEN_HEIGHT / 2)
         self.free_fall_time = free_fall_time
-        self._wing_up_, self._wing_down_ = images
-        self._mask_wingup = pygame.mask.from_surface(self._wing_up_)
-        self._mask_wingdown = pygame.mask.from_surface(self._wing_down_)
-
-    def update(self, delta_frames=1):
-        # update bird frame
+        # the bird's position, width, and height, moved along in update()
+        self.rect = Rect(self.x, self.y, Bird.WIDTH, Bird.HEIGHT)
+        # wing down and wing up frames, indexed by whether the wing is up
+        wing_up, wing_down = images
+        mask_wingup, mask_wingdown = masks
+        self._wings = (wing_down, wing_up)
+        self._wing_masks = (mask_wingdown, mask_wingup)
+
+        # image to draw this frame and its bitmask for collision detection, the
+        # mask excludes all pixels with a transparency greater than 127
+        self.image = wing_up
+        self.mask = mask_wingup
+
+    def update(self, frame_clock, delta_frames=1,
+               _climb_duration=CLIMB_DURATION, _climb_speed=CLIMB_SPEED,
+               _sink_speed=SINK_SPEED, _frame_msec=FRAME_MSEC,
+               _climb_lut=_CLIMB_LUT, _climb_steps=_CLIMB_STEPS):
+        # update bird frame, the underscored defaults bind constants as locals
+        # and are not meant to be passed
+
+        # switches bird's wing up and down images depending on the frame
+        wing = (frame_clock & 31) >= 4
+        self.image = self._wings[wing]
+        self.mask = self._wing_masks[wing]
+
+        delta_msec = delta_frames * _frame_msec
 
         # if bird is allowed to fall free without any intervention
         if self.free_fall_time > 0:
 
-            frac_climb_done = 1 - self.free_fall_time / Bird.CLIMB_DURATION
-            self.y -= (Bird.CLIMB_SPEED * conversions.frames_to_msec(delta_frames) *
-                       (1 - math.cos(frac_climb_done * math.pi)))
+            frac_climb_done = 1 - self.free_fall_time / _climb_duration
+            self.y -= (_climb_speed * delta_msec *
+                       _climb_lut[int(frac_climb_done * _climb_steps + 0.5)])
 
-            self.free_fall_time -= conversions.frames_to_msec(delta_frames)
+            self.free_fall_time -= delta_msec
         else:
-            self.y += Bird.SINK_SPEED * conversions.frames_to_msec(delta_frames)
+            self.y += _sink_speed * delta_msec
 
-    @property
-    def animate(self):
-        # switches bird's wing up and down images depending on milliseconds
-        if pygame.time.get_ticks() % 31 >= 4:
-            return self._wing_up_
-        else:
-            return self._wing_down_
+        self.rect.y = int(self.y)
 
-    @property
-    def mask(self):
-        """Get a bitmask for use in collision detection.
 
-        The bitmask excludes all pixels in self.image with a
-        transparency greater than 127."""
-        if pygame.time.get_ticks() % 500 >= 250:
-            return self._mask_wingup
-        else:
-            return self._mask_wingdown
-
-    @property
-    def rect(self):
-        """Get the bird's position, width, and height, as a pygame.Rect."""
-        return Rect(self.x, self.y, Bird.WIDTH, Bird.HEIGHT)
-
-
-class PipePair(pygame.sprite.Sprite):s
+class PipePair(object):
 
     WIDTH = 80
     PIECE_HEIGHT = 32
     ADD_INTERVAL = 3500
 
-    def __init__(self, pipes_images):
+    __slots__ = ('spawn_x', 'score_count', 'pipe_tp', 'pipe_bl',
+                 'top_pipe_height_pixel', 'bottom_pipe_height_pixel', 'top_y', 'bottom_y',
+                 'top_image', 'top_mask', 'bottom_image', 'bottom_mask')
+
+    def __init__(self, pipes_images, world_offset):
 
         # print(pipes_images)
-        pipe_end_img, pipe_body_img = pipes_images
-        self.x = float(SCREEN_WIDTH - 1)
+        pipe_end_img, pipe_body_column = pipes_images
+        # all pipes scroll by the same world_offset, so a pipe only remembers
+        # where it was spawned; its position on screen is spawn_x - world_offset
+        self.spawn_x = world_offset + SCREEN_WIDTH - 1
         self.score_count = False
 
-        self.image = pygame.Surface((PipePair.WIDTH, SCREEN_HEIGHT), SRCALPHA)
-
         # calculattion for gap
         pipe_length = int(
             (SCREEN_HEIGHT -  # fill window from top to bottom
@@ -94,76 +114,105 @@ class PipePair(pygame.sprite.Sprite):s
         self.pipe_bl = randint(1, pipe_length)
         self.pipe_tp = pipe_length - self.pipe_bl
 
-        # display lower pipe
-        for i in range(1, self.pipe_bl + 1):
-            piece_position = (0, SCREEN_HEIGHT - i * PipePair.PIECE_HEIGHT)
-            self.image.blit(pipe_body_img, piece_position)
-        bottom_pipe_end_y = SCREEN_HEIGHT - self.bottom_pipe_height_pixel
-        bottom_end_piece_position = (0, bottom_pipe_end_y - PipePair.PIECE_HEIGHT)
-        self.image.blit(pipe_end_img, bottom_end_piece_position)
-
-        # display upper pipe
-        for i in range(self.pipe_tp):
-            self.image.blit(pipe_body_img, (0, i * PipePair.PIECE_HEIGHT))
-        top_pipe_end_y = self.top_pipe_height_pixel
-        self.image.blit(pipe_end_img, (0, top_pipe_end_y))
-
         # compensate for added end pieces
         self.pipe_tp += 1
         self.pipe_bl += 1
-
-        # for collision detection
-        self.mask = pygame.mask.from_surface(self.image)
-
-    @property
-    def top_pipe_height_pixel(self):
-        return self.pipe_tp * PipePair.PIECE_HEIGHT
-
-    @property
-    def bottom_pipe_height_pixel(self):
-        return self.pipe_bl * PipePair.PIECE_HEIGHT
-
-    @property
-    def rect(self):
-        # Return pipe pair rectangle for collision detection
-        return Rect(self.x, 0, PipePair.WIDTH, PipePair.PIECE_HEIGHT)
-
-    def update(self, delta_frames=1):
-        # update pipe pair
-        self.x -= ANIMATION_SPEED * conversions.frames_to_msec(delta_frames)
-
-    @property
-    def visible(self):
-        # display pipe?
-        if -PipePair.WIDTH < self.x < SCREEN_WIDTH:
-            return True
-
-    def collides_with(self, bird):
-        # detects collision
-        return pygame.sprite.collide_mask(self, bird)
-
-
-class conversions():
-    def frames_to_msec(frames, fps=FPS):
-        return 1000.0 * frames / fps
-
-    def msec_to_frames(milliseconds, fps=FPS):
-        return fps * milliseconds / 1000.0
+        self.top_pipe_height_pixel = self.pipe_tp * PipePair.PIECE_HEIGHT
+        self.bottom_pipe_height_pixel = self.pipe_bl * PipePair.PIECE_HEIGHT
+
+        # the gap between the pipes is empty, so each pipe gets its own surface
+        # and mask covering just the pipe; top_y and bottom_y are their offsets
+        # from the top of the screen
+        self.top_y = 0
+        self.bottom_y = SCREEN_HEIGHT - self.bottom_pipe_height_pixel
+
+        # pipes with the same layout look the same, so build each one only once
+        key = (self.pipe_tp, self.pipe_bl)
+        if key not in _pipe_cache:
+            top_image = pygame.Surface((PipePair.WIDTH, self.top_pipe_height_pixel), SRCALPHA)
+            bottom_image = pygame.Surface((PipePair.WIDTH, self.bottom_pipe_height_pixel),
+                                          SRCALPHA)
+
+            # display upper pipe, its end piece sits at the bottom
+            top_body_height = (self.pipe_tp - 1) * PipePair.PIECE_HEIGHT
+            top_image.blits((
+                (pipe_body_column, (0, 0), Rect(0, 0, PipePair.WIDTH, top_body_height)),
+                (pipe_end_img, (0, top_body_height))), doreturn=False)
+
+            # display lower pipe, its end piece sits at the top
+            bottom_body_height = (self.pipe_bl - 1) * PipePair.PIECE_HEIGHT
+            bottom_image.blits((
+                (pipe_body_column, (0, PipePair.PIECE_HEIGHT),
+                 Rect(0, 0, PipePair.WIDTH, bottom_body_height)),
+                (pipe_end_img, (0, 0))), doreturn=False)
+
+            # for collision detection
+            _pipe_cache[key] = (top_image, pygame.mask.from_surface(top_image),
+                                bottom_image, pygame.mask.from_surface(bottom_image))
+
+        (self.top_image, self.top_mask,
+         self.bottom_image, self.bottom_mask) = _pipe_cache[key]
+
+    def collides_with(self, bird, world_offset):
+        # detects collision with either pipe, offsets are relative to the bird;
+        # callers check the horizontal overlap, so a pipe's mask only needs
+        # testing when the bird's rect also reaches into it vertically
+        bird_rect = bird.rect
+        bird_mask = bird.mask
+        x_offset = int(self.spawn_x - world_offset) - bird_rect.x
+        if bird_rect.top < self.top_y + self.top_pipe_height_pixel:
+            if bird_mask.overlap(self.top_mask, (x_offset, self.top_y - bird_rect.y)):
+                return True
+        if bird_rect.bottom > self.bottom_y:
+            if bird_mask.overlap(self.bottom_mask, (x_offset, self.bottom_y - bird_rect.y)):
+                return True
+        return False
+
+
+def msec_to_frames(milliseconds, fps=FPS):
+    # frame to millisecond conversion is a multiplication with FRAME_MSEC
+    return fps * milliseconds / 1000.0
+
+
+# number of frames between two new pipe pairs
+ADD_INTERVAL_FRAMES = int(msec_to_frames(PipePair.ADD_INTERVAL))
 
 
 def load_image(image):
-    image = image + ".png"
-    file_name = os.path.join('.', 'images', image)
+    # loads an image once and hands out the cached surface afterwards, the
+    # display has to be set up first so it can be converted to its format
+    if image in _image_cache:
+        return _image_cache[image]
+    file_name = os.path.join('.', 'images', image + ".png")
     # print(file_name)
     img = pygame.image.load(file_name)
-    img.convert()
+    if image in _opaque_images:
+        img = img.convert()
+    else:
+        img = img.convert_alpha()
+    _image_cache[image] = img
     return img
 
 
+def load_mask(image):
+    # builds the bitmask of an image once and hands out the cached mask afterwards
+    if image not in _mask_cache:
+        _mask_cache[image] = pygame.mask.from_surface(load_image(image))
+    return _mask_cache[image]
+
+
+def build_pipe_column(pipe_body_img):
+    # stacks pipe body pieces into one screen high column, pipes are cut from it
+    column = pygame.Surface((PipePair.WIDTH, SCREEN_HEIGHT), SRCALPHA)
+    column.blits([(pipe_body_img, (0, y))
+                  for y in range(0, SCREEN_HEIGHT, PipePair.PIECE_HEIGHT)], doreturn=False)
+    return column
+
+
 def setup_environment():
-    images = ['1', 'pipe_end', 'pipe_body', 'bird_wing_up', 'bird_wing_down']
-    for item in images:
-        load_image(item)
+    # preloads every image the game uses and returns them keyed by name
+    images = ['background', 'pipe_end', 'pipe_body', 'bird_wing_up', 'bird_wing_down']
+    return {item: load_image(item) for item in images}
 
 
 def main():
@@ -174,38 +223,48 @@ def main():
     backend_frame = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
     pygame.display.set_caption('Flappy Bird')
 
+    # only these events are handled, don't let any others queue up; keep the
+    # window events so a damaged window gets fully repainted
+    game_events = (QUIT, KEYUP, MOUSEBUTTONUP, WINDOWEXPOSED, WINDOWRESTORED)
+    pygame.event.set_blocked(None)
+    pygame.event.set_allowed(game_events)
+
     clock = pygame.time.Clock()
     score_style = pygame.font.SysFont(None, 28, bold=True)
 
     images = setup_environment()
-    pipes_images = (load_image('pipe_end'), load_image('pipe_body'))
+    pipes_images = (images['pipe_end'], build_pipe_column(images['pipe_body']))
 
     # pygame.time.wait(1000000)
     wing_up = 'bird_wing_up'
     wing_down = 'bird_wing_down'
 
-    bird = Bird(2, (load_image(wing_up), load_image(wing_down)))
+    bird = Bird(2, (images[wing_up], images[wing_down]),
+                (load_mask(wing_up), load_mask(wing_down)))
 
     pipes = deque()
+    world_offset = 0.0  # how far the pipes have scrolled to the left
+
+    background_img = images['background']
+    background_seq = [(background_img, pos) for pos in _BG_POSITIONS]
 
     frame_clock = 0  # this counter is only incremented if the game isn't paused
     score = 0
+    rendered_score = None  # score shown by score_surface
+    prev_rects = None  # screen areas updated last frame, None flips the whole screen
     done = False
     while not done:
         clock.tick(FPS)
 
-        if not (frame_clock % conversions.msec_to_frames(PipePair.ADD_INTERVAL)):
-          pipes.append(PipePair(pipes_images))
+        if frame_clock % ADD_INTERVAL_FRAMES == 0:
+          pipes.append(PipePair(pipes_images, world_offset))
 
-        for x in (0, SCREEN_WIDTH / 2):
-            backend_frame.blit(load_image('background'), (x, 0))
+        bird.update(frame_clock)
+        world_offset += ANIMATION_SPEED * FRAME_MSEC
 
-        bird.update()
-        backend_frame.blit(bird.animate, bird.rect)
-
-        for p in pipes:
-            p.update()
-            backend_frame.blit(p.image, p.rect)
+        # pipes leave the screen on the left in the order they were added
+        while pipes and pipes[0].spawn_x <= world_offset - PipePair.WIDTH:
+            pipes.popleft()
 
         for event in pygame.event.get():
             if event.type == QUIT or (event.type == KEYUP and event.key == K_ESCAPE):
@@ -214,25 +273,53 @@ def main():
             elif event.type == MOUSEBUTTONUP or (event.type == KEYUP and
                                                  event.key in (K_UP, K_RETURN, K_SPACE)):
                 bird.free_fall_time = Bird.CLIMB_DURATION
+            elif event.type in (WINDOWEXPOSED, WINDOWRESTORED):
+                # the window contents were damaged, repaint all of it
+                prev_rects = None
 
-        # update and display score
+        # update and display score, only the first pipe the bird has not
+        # passed yet can be passed this frame
         for p in pipes:
-            if p.x + PipePair.WIDTH < bird.x and not p.score_count:
-                score += 1
-                p.score_count = True
-
-        #score updation and siplay
-        score_surface = score_style.render("Score: " + str(score), True, (255, 255, 255))
-        score_x = SCREEN_WIDTH / 2 - score_surface.get_width() / 2
-        backend_frame.blit(score_surface, (score_x, PipePair.PIECE_HEIGHT))
+            if not p.score_count:
+                if p.spawn_x + PipePair.WIDTH < bird.x + world_offset:
+                    score += 1
+                    p.score_count = True
+                break
 
-        #collision check
-        pipe_collision = any(p.collides_with(bird) for p in pipes)
+        #score updation and siplay, the text is only rendered again when it changes
+        if score != rendered_score:
+            score_surface = score_style.render(f"Score: {score}", True, (255, 255, 255))
+            score_x = SCREEN_WIDTH / 2 - score_surface.get_width() / 2
+            score_rect = score_surface.get_rect(topleft=(score_x, PipePair.PIECE_HEIGHT))
+            rendered_score = score
+
+        # draw the whole frame with a single call into pygame
+        blit_seq = background_seq.copy()
+        blit_seq.append((bird.image, bird.rect))
+        dirty_rects = [bird.rect.copy(), score_rect]
+        for p in pipes:
+            x = p.spawn_x - world_offset
+            blit_seq.append((p.top_image, (x, p.top_y)))
+            blit_seq.append((p.bottom_image, (x, p.bottom_y)))
+            dirty_rects.append(Rect(x, 0, PipePair.WIDTH, SCREEN_HEIGHT))
+        blit_seq.append((score_surface, score_rect))
+        backend_frame.blits(blit_seq, doreturn=False)
+
+        #collision check, only pipes overlapping the bird horizontally need the mask test
+        min_spawn_x = bird.x + world_offset - PipePair.WIDTH
+        max_spawn_x = bird.x + world_offset + Bird.WIDTH
+        pipe_collision = any(p.collides_with(bird, world_offset) for p in pipes
+                             if min_spawn_x < p.spawn_x < max_spawn_x)
         if pipe_collision or 0 >= bird.y or bird.y >= SCREEN_HEIGHT - Bird.HEIGHT:
             done = True
 
-        #updates surface
-        pygame.display.flip()
+        #updates surface, unless a full flip is due only the areas where sprites
+        #were drawn last frame or are drawn now can have changed
+        if prev_rects is None:
+            pygame.display.flip()
+        else:
+            pygame.display.update(prev_rects + dirty_rects)
+        prev_rects = dirty_rects
         frame_clock += 1
 
 